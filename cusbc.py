@@ -1,76 +1,167 @@
+import binascii
+import re
 import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple, Union
 from dataclasses import dataclass
 
-FILEPATH_CUCBC = Path(__file__).parent / 'CUSBC.exe'
+try:  # Optional JIT path for long hex states; the package stays pure Python without it
+    import numba as nb
+    import numpy as np
+except ImportError:
+    nb = None
 
-@dataclass
+FILEPATH_CUCBC = str(Path(__file__).parent / 'CUSBC.exe')
+
+# Lookup table mapping each byte value to its bits as 0/1 ints, least significant bit first
+_BYTE_BITS: List[Tuple[int, ...]] = [tuple((b >> i) & 1 for i in range(8)) for b in range(256)]
+
+# Hex states at least this many bytes long are unpacked by the Numba kernel when it is available
+_JIT_MIN_BYTES = 64
+
+if nb is not None:
+    @nb.njit(cache=True)
+    def _unpack_bits(buf):
+        """Unpack a uint8 array into booleans, least significant bit of each byte first."""
+        out = np.empty(buf.size * 8, np.bool_)
+        for i in range(buf.size):
+            b = buf[i]
+            base = i * 8
+            for k in range(8):
+                out[base + k] = (b >> k) & 1
+        return out
+
+# Precomputed set_port_states arguments for every 4-port state tuple, the common hub size
+_STATE4_B: Dict[Tuple[bool, ...], str] = {
+    tuple(bool((i >> k) & 1) for k in range(4)): f"{i:04b}" for i in range(16)
+}
+_STATE4_H: Dict[Tuple[bool, ...], str] = {
+    tuple(bool((i >> k) & 1) for k in range(4)): f"{i:x}" for i in range(16)
+}
+
+# Matches a combined "/Q -F" hub entry: COM port, 8 hex state chars, 2 hex port-count chars, firmware version
+_HUB_ENTRY_RE = re.compile(rb"(COM\d+):([0-9A-Fa-f]{10}[^,\s]*)")
+
+# Translation table mapping ASCII '1' to byte 1 and every other character to byte 0
+_BIT_TRANS = bytes(int(c == ord("1")) for c in range(256))
+
+@dataclass(slots=True, frozen=True)
 class HubInfo:
     """Data class to store information about a USB hub."""
     port: str
     num_ports: int
     firmware_version: str
-    port_states: List[bool]  # List of port states represented as booleans
+    port_states: Tuple[bool, ...]  # Port states represented as booleans
+    bitmap: int = 0  # Port states packed into an integer, first port in the least significant bit
 
 class PortState:
     """Helper class to manage port states in a more user-friendly way."""
     
     @staticmethod
-    def from_bitmapped(bitmapped: str) -> tuple[bool]:
-        """Convert reversed bitmapped port states (string) into a tuple of booleans."""
-        return tuple([state == '1' for state in bitmapped[::-1]])
+    def from_bitmapped(bitmapped: Union[str, bytes]) -> tuple[bool]:
+        """Convert reversed bitmapped port states (string or ASCII bytes) into a tuple of booleans."""
+        if isinstance(bitmapped, str):
+            bitmapped = bitmapped.encode("ascii")
+        return tuple(map(bool, bitmapped[::-1].translate(_BIT_TRANS)))
     
     @staticmethod
-    def from_hex(hex_state: str) -> tuple[bool]:
-        """Convert hex-encoded port states into a tuple of booleans (right to left)."""
-        # Ensure the hex string is padded to an even length (e.g., 'F8' becomes 'F8')
-        hex_state = hex_state.zfill(len(hex_state) + (len(hex_state) % 2))
+    def from_hex(hex_state: Union[str, bytes]) -> tuple[bool]:
+        """Convert hex-encoded port states (string or ASCII bytes) into a tuple of booleans (right to left)."""
+        if isinstance(hex_state, str):
+            hex_state = hex_state.encode("ascii")
+
+        # Ensure the hex string has an even length by prepending a '0' nibble (e.g., 'F' becomes '0F')
+        if len(hex_state) % 2:
+            hex_state = b"0" + hex_state
+
+        buf = binascii.unhexlify(hex_state)
 
-        # Process each pair of hex characters (2 chars = 1 byte = 8 bits)
+        if nb is not None and len(buf) >= _JIT_MIN_BYTES:
+            return tuple(_unpack_bits(np.frombuffer(buf, dtype=np.uint8)).tolist())
+
+        # Expand each byte into its 8 bits, least significant bit first
         port_states = []
-        for i in range(0, len(hex_state), 2):
-            # Get each byte (pair of hex chars)
-            byte = hex_state[i:i+2]
-            
-            # Convert the byte to binary and reverse the bit order
-            bin_state = bin(int(byte, 16))[2:].zfill(8)[::-1]
-            
-            # Add the reversed boolean values (1 -> True, 0 -> False)
-            port_states.extend([bit == '1' for bit in bin_state])
-
-        return tuple(port_states)
+        for b in buf:
+            port_states.extend(_BYTE_BITS[b])
+
+        return tuple(map(bool, port_states))
 
 class CUSBC:
     """Class to interact with CUSBC.exe for USB hub control."""
 
-    def __init__(self, port: Optional[str] = None, password: Optional[str] = None):
+    # Pre-bound subprocess runner and argv prefix for _run_command
+    _RUN = staticmethod(subprocess.run)
+    _EXE = (FILEPATH_CUCBC,)
+
+    # Whether "/Q -F" returns per-hub info alongside the port list; None until probed on first query
+    _supports_batched_query: Optional[bool] = None
+
+    def __init__(self, port: Optional[str] = None, password: Optional[str] = None,
+                 session_strategy: str = "isolated", cache_ttl: float = 2.0):
         """
         Initialize with a specific COM port and optional password.
         
         :param port: The COM port of the USB hub (e.g., "COM1"). If None, the port is discovered automatically.
         :param password: Optional password for accessing certain features of the hub.
+        :param session_strategy: "isolated" to query hubs one after another, or "batched" to run the
+                                 per-hub queries concurrently so the subprocess waits overlap.
+        :param cache_ttl: Seconds for which the result of query_hubs is reused before re-querying.
         """
+        if session_strategy not in ("isolated", "batched"):
+            raise ValueError("Invalid session strategy: choose 'isolated' or 'batched'.")
         self.port = port
         self.password = password
+        self.session_strategy = session_strategy
+        self.cache_ttl = cache_ttl
+        self._hubs_cache: Optional[Tuple[float, List[HubInfo]]] = None
         if not self.port:
             self.port = self.find_available_port()
 
+    @classmethod
+    def _run_command(cls, args: List[str]) -> bytes:
+        """
+        Run CUSBC.exe with the given arguments and return the raw output.
+
+        The output is plain ASCII, so it is returned as bytes and decoded only where a string is needed.
+
+        CUSBC.exe has no interactive mode and executes exactly one command per process, so each call
+        spawns a new process; callers amortize this through the hub cache and batched queries instead.
+        """
+        return cls._RUN(cls._EXE + tuple(args), capture_output=True).stdout.strip()
+
+    def invalidate_cache(self) -> None:
+        """Drop the cached hub list so the next query_hubs call queries CUSBC.exe again."""
+        self._hubs_cache = None
+
+    def _cached_hubs(self) -> Optional[List[HubInfo]]:
+        """Return the cached hub list if it is younger than cache_ttl, otherwise None."""
+        if self._hubs_cache is not None:
+            timestamp, hubs = self._hubs_cache
+            if time.monotonic() - timestamp < self.cache_ttl:
+                return hubs
+        return None
+
     @staticmethod
-    def _run_command(args: List[str]) -> str:
-        """Run CUSBC.exe with the given arguments and return the output."""
-        result = subprocess.run([FILEPATH_CUCBC] + args, capture_output=True, text=True)
-        return result.stdout.strip()
+    def _parse_hub_ports(output: bytes) -> List[str]:
+        """Extract the COM ports from the output of "/Q -F" (hub count followed by comma-separated entries)."""
+        return [entry.split(b":", 1)[0].decode("ascii") for entry in output[4:].split(b",") if entry]
+
+    def _list_hub_ports(self) -> List[str]:
+        """List the COM ports of all connected hubs with a single CUSBC.exe call."""
+        return self._parse_hub_ports(self._run_command(["/Q", "-F"]))
 
     def find_available_port(self) -> str:
         """
-        Find the first available USB hub port by querying all hubs.
+        Find the first available USB hub port, without fetching per-hub info.
         
         :return: The COM port of the first available USB hub.
         """
-        hubs = self.query_hubs()
-        if hubs:
-            return hubs[0].port  # Return the first available hub's port
+        hubs = self._cached_hubs()
+        ports = [hub.port for hub in hubs] if hubs is not None else self._list_hub_ports()
+        if ports:
+            return ports[0]  # Return the first available hub's port
         else:
             raise ValueError("No available USB hub found.")
 
@@ -80,30 +171,54 @@ class CUSBC:
         
         :return: A list of HubInfo dataclasses representing all connected hubs.
         """
+        hubs = self._cached_hubs()
+        if hubs is not None:
+            return list(hubs)
+
         output = self._run_command(["/Q", "-F"])
         hub_count = int(output[:4])  # Extract hub count from the output
-        ports = output[4:].split(",")  # Split the ports by commas
-        
-        hubs = []
-        for port in ports:
-            hub_info = self.query_hub_info(port)
-            hubs.append(HubInfo(port=port, **hub_info))
-        
-        return hubs
+
+        entries = []
+        if CUSBC._supports_batched_query is not False and output[4:]:
+            # Parse per-hub info straight from the enumeration output when the tool provides it
+            entries = _HUB_ENTRY_RE.findall(output[4:])
+            CUSBC._supports_batched_query = bool(entries)
+
+        if entries:
+            ports = [port.decode("ascii") for port, _ in entries]
+            infos = dict(zip(ports, (self._parse_hub_info(info) for _, info in entries)))
+        else:
+            ports = self._parse_hub_ports(output)
+            if self.session_strategy == "batched" and len(ports) > 1:
+                # CUSBC.exe handles a single command per invocation, so overlap the per-hub queries instead
+                with ThreadPoolExecutor(max_workers=len(ports)) as executor:
+                    infos = dict(zip(ports, executor.map(self.query_hub_info, ports)))
+            else:
+                infos = {port: self.query_hub_info(port) for port in ports}
+
+        hubs = [HubInfo(port=port, **infos[port]) for port in ports]
+        self._hubs_cache = (time.monotonic(), hubs)
+        return list(hubs)
 
     def query_hub_info(self, port: str) -> Dict[str, str]:
         """
         Query information about a specific USB hub based on the given port.
         
         :param port: The port identifier for the hub.
-        :return: A dictionary with "port_states", "num_ports", and "firmware_version".
+        :return: A dictionary with "port_states", "bitmap", "num_ports", and "firmware_version".
         """
-        output = self._run_command([f"/Q:{port}", "-F"])
+        return self._parse_hub_info(self._run_command([f"/Q:{port}", "-F"]))
+
+    @staticmethod
+    def _parse_hub_info(output: bytes) -> Dict[str, str]:
+        """Parse the formatted output of a single hub query into a HubInfo keyword dictionary."""
         num_ports = int(output[8:10], 16)
+        port_states = PortState.from_hex(output[:8])[:num_ports]  #4 bits per hex value
         return {
-            "port_states": PortState.from_hex(output[:8])[:num_ports],  #4 bits per hex value
+            "port_states": port_states,
+            "bitmap": sum(1 << i for i, s in enumerate(port_states) if s),
             "num_ports": num_ports,  # Extract the number of ports (in hex)
-            "firmware_version": output[10:]  # Rest of the output is the firmware version
+            "firmware_version": output[10:].decode("ascii")  # Rest of the output is the firmware version
         }
 
     def get_port_states(self, mode: str = "-B") -> List[bool]:
@@ -128,17 +243,22 @@ class CUSBC:
         :param state: The state to set the ports to as a tuple of booleans.
         :param mode: The format for the state, "B" for bit-mapped or "H" for hex.
         """
-        # Reverse the state before processing
-        state = state[::-1]
-
-        if mode == "B":
-            # Convert the reversed state to a bit-mapped string
-            state_str = ''.join(['1' if s else '0' for s in state])
-        elif mode == "H":
-            # Convert the reversed state to a hex string
-            state_str = hex(int(''.join(['1' if s else '0' for s in state]), 2))[2:]
-        else:
+        if mode not in ("B", "H"):
             raise ValueError("Invalid mode: choose 'B' for bit-mapped or 'H' for hex.")
+
+        state_str = None
+        if len(state) == 4:
+            # Fast path for 4-port hubs; non-bool states fall through to the generic path
+            state_str = (_STATE4_B if mode == "B" else _STATE4_H).get(tuple(state))
+
+        if state_str is None:
+            # Pack the states into an integer, first port in the least significant bit
+            n = 0
+            for i, s in enumerate(state):
+                n |= (1 if s else 0) << i
+
+            # Bit-mapped string with the last port first, or hex string of the packed states
+            state_str = f"{n:b}".zfill(len(state)) if mode == "B" else f"{n:x}"
         
         args = [f"/S:{self.port}"]
         if self.password:
@@ -147,24 +267,28 @@ class CUSBC:
         
         # Run the command with the constructed arguments
         self._run_command(args)
+        self.invalidate_cache()
 
     def save_initial_states(self) -> None:
         """Save the current port states to flash memory as the initial states."""
         if not self.password:
             raise ValueError("Password is required for this operation.")
         self._run_command([f"/W:{self.port}", self.password])
+        self.invalidate_cache()
 
     def restore_factory_defaults(self) -> None:
         """Restore the hub to its factory default settings."""
         if not self.password:
             raise ValueError("Password is required for this operation.")
         self._run_command([f"/D:{self.port}", self.password])
+        self.invalidate_cache()
 
     def reset_hub(self) -> None:
         """Reset the entire USB hub."""
         if not self.password:
             raise ValueError("Password is required for this operation.")
         self._run_command([f"/R:{self.port}", self.password])
+        self.invalidate_cache()
 
     def change_password(self, new_password: str) -> None:
         """Change the password for the hub."""
@@ -181,8 +305,8 @@ if __name__ == "__main__":
     for hub_info in hubs:
         print(f"Hub: {hub_info.port}, Num Ports: {hub_info.num_ports}, Firmware Version: {hub_info.firmware_version}")
 
-    # Get information about the specific hub
-    hub_info = hub.query_hubs()
+    # Get information about the specific hub from the hubs queried above
+    hub_info = next(info for info in hubs if info.port == hub.port)
     print(f"Hub info: {hub_info}")
 
     # Get port states in bit-mapped format